@@ -1,9 +1,104 @@
-import uuid
+import itertools
 
 import logging
 
+try:
+    from sys import intern
+except ImportError:
+    # Python 2: intern is a builtin
+    pass
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2: no read-only mapping view, compiled tables stay plain dicts
+    MappingProxyType = dict
+
+log = logging.getLogger(__name__)
+
+# Largest number of (state, transition name) slots for which a dense dispatch table is built
+_MAX_DISPATCH_TABLE_SIZE = 1 << 14
+
+# Largest number of dense dispatch table slots per transition, i.e. the table must be at least a quarter full
+_MAX_DISPATCH_TABLE_SLOTS_PER_TRANSITION = 4
+
+# Key tags of CompiledFSM._lookup: (_BY_NAME, source_id, transition_name) and (_BY_DEST, source_id, destination_id)
+_BY_NAME = 0
+_BY_DEST = 1
+
+
+def _intern_name(name):
+    '''
+    Interns the state or transition name so that lookups and comparisons hit the identity fast path
+    :param name: (string)
+    :return: (string)
+    '''
+    return intern(name) if type(name) is str else name
+
+
+# Generated transition function factories, keyed by the names of the functions the transition calls
+_transition_factories = {}
+
+
+def _get_transition_factory(function_names):
+    '''
+    Returns the factory of transition functions calling the given state and transition functions.
+    There are only eight combinations, so each one is generated and compiled at most once per process.
+    :param function_names: (tuple)  Names of the functions which are set, out of before_exit, on_transition, after_entry
+    :return: (function)
+    '''
+    factory = _transition_factories.get(function_names)
+    if factory is None:
+        lines = ['def factory(log, DEBUG, message, before_exit, on_transition, after_entry, destination_id):',
+                 '    def execute(fsm, kwargs):',
+                 '        if log.isEnabledFor(DEBUG):',
+                 '            log.debug(message)']
+        if function_names:
+            # Call without unpacking in the common case of no keyword arguments
+            lines.append('        if kwargs:')
+            lines.extend('            {}(**kwargs)'.format(name) for name in function_names)
+            lines.append('        else:')
+            lines.extend('            {}()'.format(name) for name in function_names)
+        lines.append('        fsm._sid = destination_id')
+        lines.append('    return execute')
+
+        namespace = {}
+        code = compile('\n'.join(lines) + '\n', '<transition {}>'.format(', '.join(function_names)), 'exec')
+        exec(code, namespace)
+        factory = _transition_factories[function_names] = namespace['factory']
+    return factory
+
+
+def _compile_transition(source_state, destination_state, transition, destination_id):
+    '''
+    Creates a function specialized for a single transition, with the state and transition functions
+    and the destination state id bound as closure variables. Functions which are not set are left out of the code.
+    The debug message is formatted once here and only logged when debug logging is enabled.
+    The created function is called as function(fsm, kwargs)
+    :param source_state: (State)
+    :param destination_state: (State)
+    :param transition: (Transition)
+    :param destination_id: (int)    State id of the destination state
+    :return: (function)
+    '''
+    functions = (('before_exit', source_state.before_exit),
+                 ('on_transition', transition.on_transition),
+                 ('after_entry', destination_state.after_entry))
+    factory = _get_transition_factory(tuple(name for name, function in functions if function))
+    message = 'Executing Transition:{} - Source:{} Destination:{}'.format(transition.name, source_state.name, destination_state.name)
+    return factory(log, logging.DEBUG, message, source_state.before_exit, transition.on_transition,
+                   destination_state.after_entry, destination_id)
+
+
+class State(object):
+    '''
+    State of the FSM.
+    NOTE: The name is read once when the FSM is compiled. Renaming the state afterwards does not affect compiled FSMs.
+          The before_exit and after_entry functions are bound when the FSM is compiled, so replacing them
+          afterwards has no effect on compiled FSMs.
+    '''
+    __slots__ = ('name', 'before_exit', 'after_entry')
 
-class State:
     def __init__(self, name, before_exit=None, after_entry=None):
         '''
         Creates a State object which will be part of the FSM
@@ -13,38 +108,20 @@ class State:
                                         NOTE: function should support all Keyword arguments as **kwargs.
                                         Reference: https://docs.python.org/2.7/tutorial/controlflow.html#keyword-arguments
         '''
-        self._name = name
-        self._before_exit = before_exit
-        self._after_entry = after_entry
-
-    @property
-    def name(self):
-        '''
-        Getter for state name
-        :return: (string)
-        '''
-        return self._name
-
-    def exit_state(self, **kwargs):
-        '''
-        Executes the before_exit function with the keyword arguments
-        :param kwargs: (optional) Input keyword arguments
-        :return: None
-        '''
-        if self._before_exit:
-            self._before_exit(**kwargs)
+        self.name = _intern_name(name)
+        self.before_exit = before_exit
+        self.after_entry = after_entry
 
-    def enter_state(self, **kwargs):
-        '''
-        Executes the after_entry function with the keyword arguments
-        :param kwargs: (optional) Input keyword arguments
-        :return: None
-        '''
-        if self._after_entry:
-            self._after_entry(**kwargs)
 
+class Transition(object):
+    '''
+    Transition between two states of the FSM.
+    NOTE: The names are read once when the FSM is compiled. Changing them afterwards does not affect compiled FSMs.
+          The on_transition function is bound when the FSM is compiled, so replacing it
+          afterwards has no effect on compiled FSMs.
+    '''
+    __slots__ = ('name', 'source_name', 'destination_name', 'on_transition')
 
-class Transition:
     def __init__(self, name, source_name, destination_name, on_transition=None):
         '''
         Creates a Transition object denoting the transition between states
@@ -56,34 +133,10 @@ class Transition:
                                             NOTE: function should support Keyword arguments as **kwargs.
                                             Reference: https://docs.python.org/2.7/tutorial/controlflow.html#keyword-arguments
         '''
-        self._name = name
-        self._source_name = source_name
-        self._destination_name = destination_name
-        self._on_transition = on_transition
-
-    @property
-    def name(self):
-        '''
-        Getter for transition name
-        :return: (string)
-        '''
-        return self._name
-
-    @property
-    def source_name(self):
-        '''
-        Getter for Transition source name
-        :return: (string)
-        '''
-        return self._source_name
-
-    @property
-    def destination_name(self):
-        '''
-        Getter for Transition destination name
-        :return: (string)
-        '''
-        return self._destination_name
+        self.name = _intern_name(name)
+        self.source_name = _intern_name(source_name)
+        self.destination_name = _intern_name(destination_name)
+        self.on_transition = on_transition
 
     def execute(self, **kwargs):
         '''
@@ -91,15 +144,21 @@ class Transition:
         :param kwargs: (optional) Input keyword arguments
         :return: None
         '''
-        if self._on_transition:
-            self._on_transition(**kwargs)
+        if self.on_transition:
+            self.on_transition(**kwargs)
+
 
+class CompiledFSM(object):
+    '''
+    Validated and immutable FSM definition holding the states and the dispatch tables.
+    A single CompiledFSM is shared by all the FSM instances created from it, which only carry their current state.
+    '''
+    __slots__ = ('_initial_sid', '_states_by_id', '_state_names', '_state_id', '_lookup', '_tid', '_n_trans', '_table')
 
-class FSM:
     def __init__(self, initial_state_name, state_list, transition_list):
         '''
-        Validates and initializes the FSM class at the given initial_state_name
-        :param initial_state_name: (string):    State name for the initial state of FSM
+        Validates and compiles the FSM definition
+        :param initial_state_name: (string):    State name for the initial state of the FSM instances
         :param state_list: (list):              List of State objects which builds the FSM
         :param transition_list: (list):         List of Transition objects for navigating between the states
         '''
@@ -107,24 +166,181 @@ class FSM:
         # Initializes the fsm data structure
         self._initialize_fsm_data_struture()
 
-        # Validate and add states
-        for state in state_list:
-            self._validate_and_add_state(state)
+        # Validate and add states with their integer state ids
+        self._validate_and_add_states(state_list)
 
-        # Validate and add transitions after adding states
+        # Validate, compile and add transitions in a single pass after adding states
         for transition in transition_list:
             self._validate_and_add_transition(transition)
 
-        # Validate and set the initial state name after adding states
+        # Build the dense dispatch table after adding transitions
+        self._build_dispatch_table()
+
+        # Validate and set the initial state name of new instances after adding states
         self._validate_and_set_initial_state(initial_state_name)
 
+        # The tables never change after compiling, and are shared by all the instances
+        self._freeze()
+
+    def new_instance(self, initial_state_name=None):
+        '''
+        Creates a new FSM instance sharing the tables of this compiled FSM
+        :param initial_state_name: (string) (optional) State name to start the instance at. Defaults to the initial state
+        :return: (FSM)
+        '''
+        return FSM(self, initial_state_name=initial_state_name)
+
+    def _validate_and_add_states(self, state_list):
+        '''
+        Assigns every state an integer state id in list order and validates that the state names are unique.
+        Raises FSMException if validation fails.
+        :param state_list:  List of State objects to validate and add
+        :return: None
+        '''
+        self._states_by_id = list(state_list)
+        self._state_id = {state.name: sid for sid, state in enumerate(self._states_by_id)}
+        if len(self._state_id) != len(self._states_by_id):
+            raise FSMException('State name must be unique, cannot add duplicate.')
+
+    def _validate_and_add_transition(self, transition):
+        '''
+        Validates the new transition for the following
+         1. Valid source name and destination name
+         2. Duplicate transition name from the same source state
+         3. Duplicate transition between the same source and destination states
+        and adds its compiled dispatch entry (see _compile_transition) to the lookup table.
+        Raises FSMException if validation fails.
+        NOTE: All the states must be added before adding transition objects as they are required for validation
+        :param transition:  Transition object to validate and add to the FSM
+        :return: None
+        '''
+        source_id = self._state_id.get(transition.source_name)
+        if source_id is None:
+            raise FSMException('Invalid source state:%s in transition:%s', transition.source_name, transition.name)
+        destination_id = self._state_id.get(transition.destination_name)
+        if destination_id is None:
+            raise FSMException('Invalid destination state:%s in transition:%s', transition.destination_name, transition.name)
+        dest_key = (_BY_DEST, source_id, destination_id)
+        if dest_key in self._lookup:
+            raise FSMException('Transition between source:%s and destination:%s already exists.', transition.source_name, transition.destination_name)
+        name_key = (_BY_NAME, source_id, transition.name)
+        if name_key in self._lookup:
+            raise FSMException('Duplication transition:%s from source:%s', transition.name, transition.source_name)
+
+        # Set the compiled transition in the flat lookup table
+        entry = _compile_transition(self._states_by_id[source_id], self._states_by_id[destination_id],
+                                    transition, destination_id)
+        self._lookup[name_key] = entry
+        self._lookup[dest_key] = entry
+        if transition.name not in self._tid:
+            self._tid[transition.name] = len(self._tid)
+
+    def _validate_and_set_initial_state(self, initial_state_name):
+        '''
+        Validates and sets the initial state name.
+        Raises FSMException if validation fails.
+        NOTE: All the states must be added before setting initial state name as it is required for validation
+        :param initial_state_name:  Initial state name to validate
+        :return: None
+        '''
+        initial_sid = self._state_id.get(initial_state_name) if initial_state_name else None
+        if initial_sid is None:
+            raise FSMException('Incorrect initial state. Set a valid initial state name.')
+        self._initial_sid = initial_sid
+
+    def _build_dispatch_table(self):
+        '''
+        Builds the dense dispatch table indexed by source_id * n_trans + tid, if it is small and full enough.
+        Sparse FSMs, e.g. with a generated transition name per transition, keep dispatching through self._lookup.
+        NOTE: All the transitions must be added before building the dispatch table
+        :return: None
+        '''
+        self._n_trans = len(self._tid)
+        table_size = len(self._states_by_id) * self._n_trans
+        # self._lookup holds a _BY_NAME and a _BY_DEST key per transition
+        n_transitions = len(self._lookup) // 2
+        if table_size > _MAX_DISPATCH_TABLE_SIZE or table_size > n_transitions * _MAX_DISPATCH_TABLE_SLOTS_PER_TRANSITION:
+            return
+        self._table = [None] * table_size
+        for (tag, source_id, transition_name), entry in self._lookup.items():
+            if tag == _BY_NAME:
+                self._table[source_id * self._n_trans + self._tid[transition_name]] = entry
+
+    def _freeze(self):
+        '''
+        Converts the compiled tables to read-only mappings and tuples
+        :return: None
+        '''
+        self._states_by_id = tuple(self._states_by_id)
+        # Snapshot of the state names, which stay valid even if a State object is renamed
+        self._state_names = tuple(state.name for state in self._states_by_id)
+        self._state_id = MappingProxyType(self._state_id)
+        self._lookup = MappingProxyType(self._lookup)
+        self._tid = MappingProxyType(self._tid)
+        if self._table is not None:
+            self._table = tuple(self._table)
+
+    def _initialize_fsm_data_struture(self):
+        # Initializes the data structure for managing FSM states and transitions
+        # States are interned to small integer ids at build time, so that every lookup on the
+        # transition path is a single flat dict access keyed by a tagged tuple.
+        # Example with sample data:
+        #
+        # self._states_by_id = [State('state1'), State('state2'), State('state3')]
+        # self._state_names = ('state1', 'state2', 'state3')
+        # self._state_id = {'state1': 0, 'state2': 1, 'state3': 2}
+        # self._lookup = {
+        #     (_BY_NAME, 0, 'transition1'): Transition(),
+        #     (_BY_NAME, 0, 'transition2'): Transition(),
+        #     (_BY_NAME, 2, 'transition3'): Transition(),
+        #     (_BY_DEST, 0, 1): Transition(),
+        #     (_BY_DEST, 0, 2): Transition(),
+        #     (_BY_DEST, 2, 0): Transition()
+        # }
+        #
+        # where each Transition stands for the compiled function of the transition.
+        #
+        # When the FSM is small, self._table holds the _BY_NAME entries in a flat list indexed by
+        # source_id * self._n_trans + tid, where self._tid maps each transition name to an integer id:
+        # self._tid = {'transition1': 0, 'transition2': 1, 'transition3': 2}
+        # self._table = [f1, f2, None, None, None, None, None, None, f3]
+        self._states_by_id = []
+        self._state_names = ()
+        self._state_id = {}
+        self._lookup = {}
+        self._tid = {}
+        self._n_trans = 0
+        self._table = None
+
+
+class FSM(object):
+    '''
+    FSM instance created from a CompiledFSM. Holds only the current state and a reference to the shared tables.
+    '''
+    __slots__ = ('_compiled', '_sid')
+
+    def __init__(self, compiled_fsm, initial_state_name=None):
+        '''
+        Initializes the FSM instance at the given initial_state_name
+        :param compiled_fsm: (CompiledFSM)  Compiled FSM definition to run
+        :param initial_state_name: (string) (optional) State name to start at. Defaults to the initial state of compiled_fsm
+        '''
+        self._compiled = compiled_fsm
+        if initial_state_name is None:
+            self._sid = compiled_fsm._initial_sid
+        else:
+            sid = compiled_fsm._state_id.get(initial_state_name)
+            if sid is None:
+                raise FSMException('Incorrect initial state. Set a valid initial state name.')
+            self._sid = sid
+
     @property
     def state(self):
         '''
         Getter for the current state name of FSM
         :return: (string)
         '''
-        return self._state
+        return self._compiled._state_names[self._sid]
 
     def execute_transition(self, transition_name, **kwargs):
         '''
@@ -133,14 +349,19 @@ class FSM:
         :param kwargs: (optional)
         :return:
         '''
-        transition = self._state_transition_map.get(self.state).get('transitions').get(transition_name)
-        if not transition:
-            raise FSMException('Invalid transition:{} from source:{}'.format(transition_name, self.state))
+        # Tables are read-only mappings, for which subscripting is cheaper than get()
+        compiled = self._compiled
+        try:
+            if compiled._table is not None:
+                entry = compiled._table[self._sid * compiled._n_trans + compiled._tid[transition_name]]
+            else:
+                entry = compiled._lookup[(_BY_NAME, self._sid, transition_name)]
+        except KeyError:
+            entry = None
+        if entry is None:
+            raise FSMException('Invalid transition:%s from source:%s', transition_name, self.state)
 
-        self._execute(self._state_transition_map.get(self.state).get('state'),
-                      self._state_transition_map.get(transition.destination_name).get('state'),
-                      transition,
-                      **kwargs)
+        entry(self, kwargs)
 
     def execute_transition_to(self, destination_name, **kwargs):
         '''
@@ -149,118 +370,74 @@ class FSM:
         :param kwargs: (optional)  Input keyword arguments for passing on to the State and Transition functions
         :return: None
         '''
-        if not self._is_valid_state(destination_name):
-            raise FSMException('Cannot execute transition. Invalid state:{}'.format(destination_name))
+        compiled = self._compiled
+        try:
+            destination_id = compiled._state_id[destination_name]
+        except KeyError:
+            destination_id = None
+        if destination_id is None:
+            raise FSMException('Cannot execute transition. Invalid state:%s', destination_name)
 
-        transition = self._state_transition_map.get(self.state).get('destination_states').get(destination_name)
-        if not transition:
-            raise FSMException('Invalid transition between source:{} and destination:{}'.format(self.state, destination_name))
+        try:
+            entry = compiled._lookup[(_BY_DEST, self._sid, destination_id)]
+        except KeyError:
+            entry = None
+        if entry is None:
+            raise FSMException('Invalid transition between source:%s and destination:%s', self.state, destination_name)
 
-        self._execute(self._state_transition_map.get(self.state).get('state'),
-                      self._state_transition_map.get(destination_name).get('state'),
-                      transition,
-                      **kwargs)
+        entry(self, kwargs)
 
-    def _execute(self, source_state, destination_state, transition, **kwargs):
+    def reset(self):
         '''
-        Executes the source state exit function, transition function and destination state entry function in this order.
-        :param source_state: (State)
-        :param destination_state: (State)
-        :param transition: (Transition)
-        :param kwargs: (optional) Input keyword arguments for passing on to the State and Transition functions
+        Moves the FSM back to the initial state of its compiled FSM without executing any functions
         :return: None
         '''
-        logging.debug('Executing Transition:{} - Source:{} Destination:{}'.format(transition.name, source_state.name, destination_state.name))
-        source_state.exit_state(**kwargs)
-        transition.execute(**kwargs)
-        destination_state.enter_state(**kwargs)
-        self._state = destination_state.name
+        self._sid = self._compiled._initial_sid
 
-    def _is_valid_state(self, state_name):
-        '''
-        Returns boolean value after validating the input state name
-        :param state_name: (string) State name to validate
-        :return: (boolean)
-        '''
-        return self._state_transition_map.get(state_name) is not None
 
-    def _validate_and_add_state(self, state):
+class FSMPool(object):
+    '''
+    Pool of pre-allocated FSM instances of the same CompiledFSM.
+    '''
+    __slots__ = ('_compiled', '_free', '_free_ids')
+
+    def __init__(self, compiled_fsm, size=0):
         '''
-        Validates whether the state name already exits and adds to FSM.
-        Raises FSMException if validation fails.
-        :param state:   State object to validate and add
-        :return: None
+        :param compiled_fsm: (CompiledFSM)  Compiled FSM definition of the pooled instances
+        :param size: (int)                  Number of instances to pre-allocate
         '''
-        if self._state_transition_map.get(state.name):
-            raise FSMException('State name must be unique, cannot add duplicate.')
-        self._state_transition_map[state.name] = {'state': state,
-                                                  'transitions': {}, 'destination_states': {}}
+        self._compiled = compiled_fsm
+        self._free = [compiled_fsm.new_instance() for _ in range(size)]
+        # Identities of the free instances, to reject releasing the same instance twice
+        self._free_ids = set(id(fsm) for fsm in self._free)
 
-    def _validate_and_add_transition(self, transition):
+    def acquire(self):
         '''
-        Validates the new transition for the following
-         1. Valid source name and destination name
-         2. Duplicate transition name from the same source state
-         3. Duplicate transition between the same source and destination states
-        Raises FSMException if validation fails.
-        NOTE: All the states must be added before adding transition objects as they are required for validation
-        :param transition:  Transition object to validate and add to the FSM
-        :return: None
+        Returns a free FSM instance at the initial state, creating a new one if the pool is empty
+        :return: (FSM)
         '''
-        if not self._is_valid_state(transition.source_name):
-            raise FSMException('Invalid source state:{} in transition:{}'.format(transition.source_name, transition.name))
-        if not self._is_valid_state(transition.destination_name):
-            raise FSMException('Invalid destination state:{} in transition:{}'.format(transition.destination_name, transition.name))
-        if self._state_transition_map.get(transition.source_name).get('destination_states').get(transition.destination_name):
-            raise FSMException('Transition between source:{} and destination:{} already exists.'.format(transition.source_name, transition.destination_name))
-        if self._state_transition_map.get(transition.source_name).get('transitions').get(transition.name):
-            raise FSMException('Duplication transition:{} from source:{}'.format(transition.name, transition.source_name))
-
-        # Set transition data in the _state_transition_map
-        self._state_transition_map[transition.source_name]['transitions'][transition.name] = transition
-        self._state_transition_map[transition.source_name]['destination_states'][transition.destination_name] = transition
+        if self._free:
+            fsm = self._free.pop()
+            self._free_ids.discard(id(fsm))
+            return fsm
+        return self._compiled.new_instance()
 
-    def _validate_and_set_initial_state(self, initial_state_name):
+    def release(self, fsm):
         '''
-        Validates and sets the initial state name.
-        Raises FSMException if validation fails.
-        NOTE: All the states must be added before setting initial state name as it is required for validation
-        :param initial_state_name:  Initial state name to validate
+        Resets the FSM instance to the initial state and returns it to the pool.
+        Raises FSMException if the instance was not created from the compiled FSM of this pool,
+        or if it is already free in this pool.
+        :param fsm: (FSM)   FSM instance to release
         :return: None
         '''
-        if not initial_state_name or not self._state_transition_map.get(initial_state_name):
-            raise FSMException('Incorrect initial state. Set a valid initial state name.')
-        self._state = initial_state_name
+        if fsm._compiled is not self._compiled:
+            raise FSMException('Cannot release an FSM instance of a different compiled FSM.')
+        if id(fsm) in self._free_ids:
+            raise FSMException('Cannot release an FSM instance which is already released.')
+        fsm.reset()
+        self._free.append(fsm)
+        self._free_ids.add(id(fsm))
 
-    def _initialize_fsm_data_struture(self):
-        # Initializes the data structure for managing FSM states and transitions
-        # Example with sample data:
-        #
-        # self._state_transition_map = {
-        #     'state1': {
-        #         'state': State(),
-        #         'transitions': {
-        #             'transition1': Transition(),
-        #             'transition2': Transition()
-        #         },
-        #         'destination_states': {
-        #             'state2': Transition(),
-        #             'state3': Transition()
-        #         }
-        #     },
-        #     'state3': {
-        #         'state': State(),
-        #         'transitions': {
-        #             'transition3': Transition(),
-        #             'transition4': Transition()
-        #         },
-        #         'destination_states': {
-        #             'state4': Transition(),
-        #             'state1': Transition()
-        #         }
-        #     }
-        # }
-        self._state_transition_map = {}
 
 class FSMBuilder:
     '''
@@ -270,10 +447,13 @@ class FSMBuilder:
         self._states = []
         self._transitions = []
         self._initial_state_name = None
+        self._name_counters = {'state': itertools.count(), 'transition': itertools.count()}
+        # Names already used in this builder, so that generated names never collide with given ones
+        self._used_names = {'state': set(), 'transition': set()}
 
     def add_state(self, before_exit=None, after_entry=None):
         '''
-        Creates a State object with a unique random name
+        Creates a State object with a unique generated name
         :param before_exit: (function)  function to execute before exiting this state
         :param after_entry: (function)  function to execute after entering this state
         :return: (State)                Returns the State object
@@ -291,11 +471,12 @@ class FSMBuilder:
         '''
         state = State(name, before_exit=before_exit, after_entry=after_entry)
         self._states.append(state)
+        self._used_names['state'].add(state.name)
         return state
 
     def add_transition(self, source_name, destination_name, on_transition=None):
         '''
-        Creates a Transition object with a unique random name, denoting the transition between states.
+        Creates a Transition object with a unique generated name, denoting the transition between states.
         :param source_name: (string)        Source state name
         :param destination_name: (string)   Destination state name
         :param on_transition: (function)    function to execute during this transition
@@ -316,6 +497,7 @@ class FSMBuilder:
         '''
         transition = Transition(transition_name, source_name, destination_name, on_transition=on_transition)
         self._transitions.append(transition)
+        self._used_names['transition'].add(transition.name)
         return transition
 
     def set_initial_state(self, state_name):
@@ -327,23 +509,49 @@ class FSMBuilder:
         '''
         self._initial_state_name = state_name
 
+    def compile(self):
+        '''
+        Validates and compiles the FSM definition. The result can create any number of FSM instances
+        :return: (CompiledFSM)
+        '''
+        return CompiledFSM(self._initial_state_name, self._states, self._transitions)
+
     def build(self):
         '''
         Builds and validates the FSM object
         :return: (FSM)
         '''
-        return FSM(self._initial_state_name, self._states, self._transitions)
+        return self.compile().new_instance()
 
     def _generate_random_name(self, prefix=''):
-        return '{}_{}'.format(prefix, str(uuid.uuid4())[:8])
+        # Names only need to be unique within this builder, so a per-prefix counter is enough,
+        # skipping the names which were already given to add_named_state or add_named_transition
+        counter = self._name_counters.get(prefix)
+        if counter is None:
+            counter = self._name_counters[prefix] = itertools.count()
+        used_names = self._used_names.get(prefix, ())
+        name = '{}_{}'.format(prefix, next(counter))
+        while name in used_names:
+            name = '{}_{}'.format(prefix, next(counter))
+        return _intern_name(name)
 
 
 class FSMException(Exception):
     '''
     Customer exception class for raising FSM exceptions
     '''
-    def __init__(self, message):
+    __slots__ = ()
+
+    def __init__(self, message, *args):
         '''
-        :param message: (string) Input error message
+        :param message: (string) Input error message, optionally with %-style placeholders
+        :param args: (optional) Values for the placeholders. Formatted only when the exception is converted to string
+                                NOTE: message is %-formatted only when args are given, so a literal '%%' is
+                                unescaped to '%' only in that case. Without args message is returned as is.
+                                args[0] of the exception is the unformatted message.
         '''
-        self._message = message
+        super(FSMException, self).__init__(message, *args)
+
+    def __str__(self):
+        message, args = self.args[0], self.args[1:]
+        return message % args if args else message
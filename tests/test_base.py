@@ -1,12 +1,14 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
 import logging
 
+import operator
+
 import sys
 
-from mock import Mock
+from mock import Mock, patch
 
-from fsm.base import FSMBuilder, FSMException
+from fsm.base import FSMBuilder, FSMException, FSMPool, MappingProxyType
 
 
 def setUpModule():
@@ -177,3 +179,167 @@ class TestFSM(TestCase):
 
         self.builder.set_initial_state(state1.name)
         self.assertRaises(FSMException, self.builder.build)
+
+    def test_fsm_builder_generated_names_skip_given_names(self):
+        state0 = self.builder.add_named_state('state_0')
+        state1 = self.builder.add_state()
+        self.assertNotEqual(state1.name, state0.name)
+
+        transition0 = self.builder.add_named_transition('transition_0', state0.name, state0.name)
+        transition1 = self.builder.add_transition(state0.name, state1.name)
+        self.assertNotEqual(transition1.name, transition0.name)
+
+        self.builder.set_initial_state(state0.name)
+        fsm = self.builder.build()
+        fsm.execute_transition(transition1.name)
+        self.assertEqual(fsm.state, state1.name)
+
+    def test_compiled_fsm_instances(self):
+        before_exit1, after_entry2 = Mock(), Mock()
+        state1 = self.builder.add_named_state('state1', before_exit=before_exit1)
+        state2 = self.builder.add_named_state('state2', after_entry=after_entry2)
+        self.builder.add_named_transition('transition12', state1.name, state2.name)
+        self.builder.add_named_transition('transition21', state2.name, state1.name)
+        self.builder.set_initial_state(state1.name)
+
+        compiled_fsm = self.builder.compile()
+        fsm1 = compiled_fsm.new_instance()
+        fsm2 = compiled_fsm.new_instance()
+        fsm3 = compiled_fsm.new_instance('state2')
+        self.assertEqual(fsm1.state, 'state1')
+        self.assertEqual(fsm3.state, 'state2')
+        self.assertRaises(FSMException, compiled_fsm.new_instance, 'state3')
+
+        fsm1.execute_transition('transition12', test_arg=111)
+        self.assertEqual(fsm1.state, 'state2')
+        self.assertEqual(fsm2.state, 'state1')
+        before_exit1.assert_called_once_with(test_arg=111)
+        after_entry2.assert_called_once_with(test_arg=111)
+
+        fsm1.reset()
+        self.assertEqual(fsm1.state, 'state1')
+        self.assertRaises(AttributeError, setattr, fsm1, 'state', 'state2')
+        self.assertEqual(fsm1.state, 'state1')
+        self.assertEqual(before_exit1.call_count, 1)
+
+    @skipIf(MappingProxyType is dict, 'read-only mappings are not available')
+    def test_compiled_fsm_tables_read_only(self):
+        state1 = self.builder.add_named_state('state1')
+        state2 = self.builder.add_named_state('state2')
+        self.builder.add_named_transition('transition12', state1.name, state2.name)
+        self.builder.set_initial_state(state1.name)
+
+        compiled_fsm = self.builder.compile()
+        self.assertRaises(TypeError, operator.setitem, compiled_fsm._lookup, (0, 1, 'transition21'), None)
+        self.assertRaises(TypeError, operator.setitem, compiled_fsm._state_id, 'state3', 2)
+        self.assertRaises(TypeError, operator.setitem, compiled_fsm._tid, 'transition21', 1)
+        self.assertIsInstance(compiled_fsm._states_by_id, tuple)
+        self.assertIsInstance(compiled_fsm._table, tuple)
+
+    def test_compiled_fsm_ignores_renamed_state(self):
+        state1 = self.builder.add_named_state('state1')
+        state2 = self.builder.add_named_state('state2')
+        self.builder.add_named_transition('transition12', state1.name, state2.name)
+        self.builder.add_named_transition('transition21', state2.name, state1.name)
+        self.builder.set_initial_state(state1.name)
+
+        fsm = self.builder.build()
+        state1.name = 'renamed'
+        self.assertEqual(fsm.state, 'state1')
+        fsm.execute_transition_to('state2')
+        fsm.execute_transition_to('state1')
+        self.assertEqual(fsm.state, 'state1')
+        self.assertRaises(FSMException, fsm.execute_transition_to, 'renamed')
+
+    def test_fsm_pool(self):
+        state1 = self.builder.add_named_state('state1')
+        state2 = self.builder.add_named_state('state2')
+        self.builder.add_named_transition('transition12', state1.name, state2.name)
+        self.builder.set_initial_state(state1.name)
+
+        compiled_fsm = self.builder.compile()
+        pool = FSMPool(compiled_fsm, size=2)
+        fsm1 = pool.acquire()
+        fsm2 = pool.acquire()
+        fsm3 = pool.acquire()
+        self.assertEqual(len(set([id(fsm1), id(fsm2), id(fsm3)])), 3)
+
+        fsm1.execute_transition_to('state2')
+        pool.release(fsm1)
+        self.assertIs(pool.acquire(), fsm1)
+        self.assertEqual(fsm1.state, 'state1')
+
+        self.assertRaises(FSMException, pool.release, self.builder.build())
+
+        pool.release(fsm2)
+        self.assertRaises(FSMException, pool.release, fsm2)
+        self.assertIs(pool.acquire(), fsm2)
+        self.assertIsNot(pool.acquire(), fsm2)
+
+    def test_fsm_dispatch_table_shared_transition_name(self):
+        on_next12, on_next23, on_next31 = Mock(), Mock(), Mock()
+        state1 = self.builder.add_named_state('state1')
+        state2 = self.builder.add_named_state('state2')
+        state3 = self.builder.add_named_state('state3')
+        self.builder.add_named_transition('next', state1.name, state2.name, on_transition=on_next12)
+        self.builder.add_named_transition('next', state2.name, state3.name, on_transition=on_next23)
+        self.builder.add_named_transition('next', state3.name, state1.name, on_transition=on_next31)
+        self.builder.add_named_transition('back', state2.name, state1.name)
+        self.builder.set_initial_state(state1.name)
+
+        compiled_fsm = self.builder.compile()
+        self.assertIsNotNone(compiled_fsm._table)
+        fsm = compiled_fsm.new_instance()
+        self.assertRaises(FSMException, fsm.execute_transition, 'back')
+        fsm.execute_transition('next')
+        self.assertEqual(fsm.state, 'state2')
+        fsm.execute_transition('next', test_arg=111)
+        self.assertEqual(fsm.state, 'state3')
+        fsm.execute_transition('next')
+        self.assertEqual(fsm.state, 'state1')
+        on_next12.assert_called_once_with()
+        on_next23.assert_called_once_with(test_arg=111)
+        on_next31.assert_called_once_with()
+
+    def test_fsm_sparse_dispatch_table_not_built(self):
+        states = [self.builder.add_state() for _ in range(5)]
+        for source, destination in zip(states, states[1:] + states[:1]):
+            self.builder.add_transition(source.name, destination.name)
+        self.builder.set_initial_state(states[0].name)
+
+        compiled_fsm = self.builder.compile()
+        self.assertIsNone(compiled_fsm._table)
+        fsm = compiled_fsm.new_instance()
+        fsm.execute_transition_to(states[1].name)
+        self.assertEqual(fsm.state, states[1].name)
+
+    @patch('fsm.base._MAX_DISPATCH_TABLE_SIZE', 0)
+    def test_fsm_without_dispatch_table(self):
+        on_transition12 = Mock()
+        state1 = self.builder.add_named_state('state1')
+        state2 = self.builder.add_named_state('state2')
+        self.builder.add_named_transition('transition12', state1.name, state2.name, on_transition=on_transition12)
+        self.builder.add_named_transition('transition21', state2.name, state1.name)
+        self.builder.set_initial_state(state1.name)
+
+        fsm = self.builder.build()
+        self.assertRaises(FSMException, fsm.execute_transition, 'transition21')
+        self.assertRaises(FSMException, fsm.execute_transition, 'transition31')
+        fsm.execute_transition('transition12', test_arg=111)
+        self.assertEqual(fsm.state, 'state2')
+        on_transition12.assert_called_once_with(test_arg=111)
+        fsm.execute_transition('transition21')
+        self.assertEqual(fsm.state, 'state1')
+
+    def test_fsm_exception_message(self):
+        state1 = self.builder.add_named_state('state1')
+        self.builder.set_initial_state(state1.name)
+        fsm = self.builder.build()
+
+        with self.assertRaises(FSMException) as context:
+            fsm.execute_transition('transition11')
+        self.assertEqual(str(context.exception), 'Invalid transition:transition11 from source:state1')
+        self.assertEqual(context.exception.args, ('Invalid transition:%s from source:%s', 'transition11', 'state1'))
+        self.assertEqual(str(FSMException('100% invalid')), '100% invalid')
+        self.assertEqual(str(FSMException('100%% invalid')), '100%% invalid')
+        self.assertEqual(str(FSMException('%s%% invalid', 100)), '100% invalid')